@@ -0,0 +1,52 @@
+// 节气查找逻辑，server.ts 运行时与 scripts/build-jieqi-table.ts 预渲染共用，
+// 保证预渲染表与实时推算得到的时刻完全一致
+import path from "path";
+import { fileURLToPath } from "url";
+
+export const JIEQI_TABLE_FILE = path.join(path.dirname(fileURLToPath(import.meta.url)), "data/jieqi-table.json");
+
+// 年中历法表未命中时，依次查看前一年、后一年的历法表
+const JIEQI_NEIGHBOR_OFFSETS = [-1, 1] as const;
+
+// 历法表可能是 Map 也可能是普通对象
+export const lookupTerm = (table: any, termName: string) =>
+  typeof table.get === 'function' ? table.get(termName) : table[termName];
+
+// getTable(year, month) 返回该月 15 日所在农历年的节气表；找不到时返回 null
+export function findJieqiTerm(year: number, termName: string, getTable: (year: number, month: number) => any) {
+  try {
+    // 优化：直接从该年的中点获取历法表，通常包含全年的节气
+    let term = lookupTerm(getTable(year, 6), termName);
+
+    if (!term || term.getYear() !== year) {
+      for (const offset of JIEQI_NEIGHBOR_OFFSETS) {
+        const t = lookupTerm(getTable(year + offset, 6), termName);
+        if (t && t.getYear() === year) {
+          term = t;
+          break;
+        }
+      }
+    }
+
+    if (term) return term;
+  } catch (e) {
+    console.error(`Error in getExactJieqi for ${termName} in ${year}:`, e);
+  }
+
+  // 保底方案：遍历该年的月份
+  try {
+    for (let m = 1; m <= 12; m++) {
+      const t = lookupTerm(getTable(year, m), termName);
+      if (t && t.getYear() === year) return t;
+    }
+  } catch (e) {}
+
+  return null;
+}
+
+// 预渲染表中每个节气记为本地时间 [年, 月, 日, 时, 分, 秒]
+export const jieqiTermToRow = (term: any) =>
+  [term.getYear(), term.getMonth(), term.getDay(), term.getHour(), term.getMinute(), term.getSecond()];
+
+export const jieqiRowToDate = (row: number[]) =>
+  new Date(row[0], row[1] - 1, row[2], row[3], row[4], row[5]);
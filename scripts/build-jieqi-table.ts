@@ -0,0 +1,39 @@
+// 预渲染 1900-2100 年的节气时刻表，供 server.ts 启动时直接载入，
+// 热路径上不再调用 lunar-javascript 逐年推算。
+// 用法：npm run build:jieqi
+import { Solar } from "lunar-javascript";
+import path from "path";
+import fs from "fs";
+import { JIEQI_TABLE_FILE, findJieqiTerm, jieqiTermToRow } from "../jieqi";
+
+const START_YEAR = 1900;
+const END_YEAR = 2100;
+const TERMS = [
+  "小寒", "大寒", "立春", "雨水", "惊蛰", "春分", "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+  "小暑", "大暑", "立秋", "处暑", "白露", "秋分", "寒露", "霜降", "立冬", "小雪", "大雪", "冬至"
+];
+
+// 同一张农历年节气表会被相邻年份反复查询，按 (year, month) 缓存
+const tableCache = new Map<string, any>();
+const getTable = (year: number, month: number) => {
+  const key = `${year}-${month}`;
+  let table = tableCache.get(key);
+  if (table === undefined) {
+    table = Solar.fromYmd(year, month, 15).getLunar().getJieQiTable();
+    tableCache.set(key, table);
+  }
+  return table;
+};
+
+// 每年一行，每个节气记为本地时间 [年, 月, 日, 时, 分, 秒]，未找到记为 null
+const years = [];
+for (let year = START_YEAR; year <= END_YEAR; year++) {
+  years.push(TERMS.map(termName => {
+    const term = findJieqiTerm(year, termName, getTable);
+    return term ? jieqiTermToRow(term) : null;
+  }));
+}
+
+fs.mkdirSync(path.dirname(JIEQI_TABLE_FILE), { recursive: true });
+fs.writeFileSync(JIEQI_TABLE_FILE, JSON.stringify({ startYear: START_YEAR, terms: TERMS, years }));
+console.log(`Wrote ${years.length} years x ${TERMS.length} terms to ${JIEQI_TABLE_FILE}`);
@@ -1,17 +1,15 @@
 import express from "express";
 console.log("Starting server...");
 import session from "express-session";
-import bcrypt from "bcryptjs";
-import { Solar, Lunar } from "lunar-javascript";
+import { Solar } from "lunar-javascript";
 import path from "path";
 import { fileURLToPath } from "url";
 import axios from "axios";
-import { GoogleGenAI } from "@google/genai";
 import "dotenv/config";
-import { createServer as createViteServer } from "vite";
 import { createClient } from '@supabase/supabase-js';
 import md5 from 'md5';
 import fs from "fs";
+import { JIEQI_TABLE_FILE, findJieqiTerm, jieqiRowToDate, jieqiTermToRow } from "./jieqi";
 
 // Initialize Supabase Admin lazily to prevent crash if env vars are missing during build/startup
 let supabaseAdminInstance: any = null;
@@ -165,29 +163,29 @@ enum Element {
   WATER = "水",
 }
 
-const ElementGeneration: Record<Element, Element> = {
-  [Element.WOOD]: Element.FIRE,
-  [Element.FIRE]: Element.EARTH,
-  [Element.EARTH]: Element.METAL,
-  [Element.METAL]: Element.WATER,
-  [Element.WATER]: Element.WOOD,
-};
-
-const ElementOvercomes: Record<Element, Element> = {
-  [Element.WOOD]: Element.EARTH,
-  [Element.EARTH]: Element.WATER,
-  [Element.WATER]: Element.FIRE,
-  [Element.FIRE]: Element.METAL,
-  [Element.METAL]: Element.WOOD,
-};
-
-const ElementOvercomer: Record<Element, Element> = {
-  [Element.WOOD]: Element.METAL,
-  [Element.METAL]: Element.FIRE,
-  [Element.FIRE]: Element.WATER,
-  [Element.WATER]: Element.EARTH,
-  [Element.EARTH]: Element.WOOD,
-};
+// 五行按 木火土金水 排列，内部以下标 0..4 参与运算，Element 仅用于展示
+const ELEMENTS: readonly Element[] = [Element.WOOD, Element.FIRE, Element.EARTH, Element.METAL, Element.WATER];
+
+// 生：木→火→土→金→水→木
+const ELEMENT_GEN: readonly number[] = [1, 2, 3, 4, 0];
+// 克：木克土、火克金、土克水、金克木、水克火
+const ELEMENT_OVC: readonly number[] = [2, 3, 4, 0, 1];
+// 被克：木←金、火←水、土←木、金←火、水←土
+const ELEMENT_OVCR: readonly number[] = [3, 4, 0, 1, 2];
+
+// 两五行之间的关系码，ELEMENT_RELATION[a * 5 + b]
+const REL_SAME = 0;     // a、b 同气
+const REL_A_GEN_B = 1;  // a 生 b
+const REL_B_GEN_A = 2;  // b 生 a
+const REL_A_OVC_B = 3;  // a 克 b
+const REL_B_OVC_A = 4;  // b 克 a
+const ELEMENT_RELATION = Int8Array.from({ length: 25 }, (_, k) => {
+  const a = Math.floor(k / 5), b = k % 5;
+  if (a === b) return REL_SAME;
+  if (ELEMENT_GEN[a] === b) return REL_A_GEN_B;
+  if (ELEMENT_GEN[b] === a) return REL_B_GEN_A;
+  return ELEMENT_OVC[a] === b ? REL_A_OVC_B : REL_B_OVC_A;
+});
 
 enum Adequacy {
   EXCESS = "太过",
@@ -195,126 +193,209 @@ enum Adequacy {
 }
 
 class HeavenlyStem {
-  static JIA = { index: 0, char: "甲", element: Element.EARTH, adequacy: Adequacy.EXCESS };
-  static YI = { index: 1, char: "乙", element: Element.METAL, adequacy: Adequacy.DEFICIENCY };
-  static BING = { index: 2, char: "丙", element: Element.WATER, adequacy: Adequacy.EXCESS };
-  static DING = { index: 3, char: "丁", element: Element.WOOD, adequacy: Adequacy.DEFICIENCY };
-  static WU = { index: 4, char: "戊", element: Element.FIRE, adequacy: Adequacy.EXCESS };
-  static JI = { index: 5, char: "己", element: Element.EARTH, adequacy: Adequacy.DEFICIENCY };
-  static GENG = { index: 6, char: "庚", element: Element.METAL, adequacy: Adequacy.EXCESS };
-  static XIN = { index: 7, char: "辛", element: Element.WATER, adequacy: Adequacy.DEFICIENCY };
-  static REN = { index: 8, char: "壬", element: Element.WOOD, adequacy: Adequacy.EXCESS };
-  static GUI = { index: 9, char: "癸", element: Element.FIRE, adequacy: Adequacy.DEFICIENCY };
+  static JIA = { index: 0, char: "甲", element: Element.EARTH, el: 2, adequacy: Adequacy.EXCESS };
+  static YI = { index: 1, char: "乙", element: Element.METAL, el: 3, adequacy: Adequacy.DEFICIENCY };
+  static BING = { index: 2, char: "丙", element: Element.WATER, el: 4, adequacy: Adequacy.EXCESS };
+  static DING = { index: 3, char: "丁", element: Element.WOOD, el: 0, adequacy: Adequacy.DEFICIENCY };
+  static WU = { index: 4, char: "戊", element: Element.FIRE, el: 1, adequacy: Adequacy.EXCESS };
+  static JI = { index: 5, char: "己", element: Element.EARTH, el: 2, adequacy: Adequacy.DEFICIENCY };
+  static GENG = { index: 6, char: "庚", element: Element.METAL, el: 3, adequacy: Adequacy.EXCESS };
+  static XIN = { index: 7, char: "辛", element: Element.WATER, el: 4, adequacy: Adequacy.DEFICIENCY };
+  static REN = { index: 8, char: "壬", element: Element.WOOD, el: 0, adequacy: Adequacy.EXCESS };
+  static GUI = { index: 9, char: "癸", element: Element.FIRE, el: 1, adequacy: Adequacy.DEFICIENCY };
+
+  private static readonly ORDER = [HeavenlyStem.JIA, HeavenlyStem.YI, HeavenlyStem.BING, HeavenlyStem.DING, HeavenlyStem.WU, HeavenlyStem.JI, HeavenlyStem.GENG, HeavenlyStem.XIN, HeavenlyStem.REN, HeavenlyStem.GUI];
 
   static list() {
-    return [this.JIA, this.YI, this.BING, this.DING, this.WU, this.JI, this.GENG, this.XIN, this.REN, this.GUI];
+    return this.ORDER;
   }
 
   static fromYear(year: number) {
-    return this.list()[((year - 4) % 10 + 10) % 10];
+    return this.ORDER[((year - 4) % 10 + 10) % 10];
   }
 }
 
 class EarthlyBranch {
-  static ZI = { index: 0, char: "子", element: Element.WATER };
-  static CHOU = { index: 1, char: "丑", element: Element.EARTH };
-  static YIN = { index: 2, char: "寅", element: Element.WOOD };
-  static MAO = { index: 3, char: "卯", element: Element.WOOD };
-  static CHEN = { index: 4, char: "辰", element: Element.EARTH };
-  static SI = { index: 5, char: "巳", element: Element.FIRE };
-  static WU = { index: 6, char: "午", element: Element.FIRE };
-  static WEI = { index: 7, char: "未", element: Element.EARTH };
-  static SHEN = { index: 8, char: "申", element: Element.METAL };
-  static YOU = { index: 9, char: "酉", element: Element.METAL };
-  static XU = { index: 10, char: "戌", element: Element.EARTH };
-  static HAI = { index: 11, char: "亥", element: Element.WATER };
+  static ZI = { index: 0, char: "子", element: Element.WATER, el: 4 };
+  static CHOU = { index: 1, char: "丑", element: Element.EARTH, el: 2 };
+  static YIN = { index: 2, char: "寅", element: Element.WOOD, el: 0 };
+  static MAO = { index: 3, char: "卯", element: Element.WOOD, el: 0 };
+  static CHEN = { index: 4, char: "辰", element: Element.EARTH, el: 2 };
+  static SI = { index: 5, char: "巳", element: Element.FIRE, el: 1 };
+  static WU = { index: 6, char: "午", element: Element.FIRE, el: 1 };
+  static WEI = { index: 7, char: "未", element: Element.EARTH, el: 2 };
+  static SHEN = { index: 8, char: "申", element: Element.METAL, el: 3 };
+  static YOU = { index: 9, char: "酉", element: Element.METAL, el: 3 };
+  static XU = { index: 10, char: "戌", element: Element.EARTH, el: 2 };
+  static HAI = { index: 11, char: "亥", element: Element.WATER, el: 4 };
+
+  private static readonly ORDER = [EarthlyBranch.ZI, EarthlyBranch.CHOU, EarthlyBranch.YIN, EarthlyBranch.MAO, EarthlyBranch.CHEN, EarthlyBranch.SI, EarthlyBranch.WU, EarthlyBranch.WEI, EarthlyBranch.SHEN, EarthlyBranch.YOU, EarthlyBranch.XU, EarthlyBranch.HAI];
 
   static list() {
-    return [this.ZI, this.CHOU, this.YIN, this.MAO, this.CHEN, this.SI, this.WU, this.WEI, this.SHEN, this.YOU, this.XU, this.HAI];
+    return this.ORDER;
   }
 
   static fromYear(year: number) {
-    return this.list()[((year - 4) % 12 + 12) % 12];
+    return this.ORDER[((year - 4) % 12 + 12) % 12];
   }
 }
 
+// 六十甲子表，下标为 (year - 4) mod 60
+const SEXAGENARY_CYCLE = Array.from({ length: 60 }, (_, i) => ({
+  stem: HeavenlyStem.list()[i % 10],
+  branch: EarthlyBranch.list()[i % 12],
+}));
+
+const sexagenaryFromYear = (year: number) => SEXAGENARY_CYCLE[((year - 4) % 60 + 60) % 60];
+
 class QiType {
-  static WEAK_YIN_WOOD = { display_name: "厥阴风木", factor: "风", element: Element.WOOD };
-  static MILD_YIN_FIRE = { display_name: "少阴君火", factor: "热", element: Element.FIRE };
-  static WEAK_YANG_FIRE = { display_name: "少阳相火", factor: "火", element: Element.FIRE };
-  static DOMINANT_YIN_EARTH = { display_name: "太阴湿土", factor: "湿", element: Element.EARTH };
-  static MILD_YANG_METAL = { display_name: "阳明燥金", factor: "燥", element: Element.METAL };
-  static DOMINANT_YANG_WATER = { display_name: "太阳寒水", factor: "寒", element: Element.WATER };
+  static WEAK_YIN_WOOD = { index: 0, display_name: "厥阴风木", prefix: "厥阴", factor: "风", element: Element.WOOD, el: 0 };
+  static MILD_YIN_FIRE = { index: 1, display_name: "少阴君火", prefix: "少阴", factor: "热", element: Element.FIRE, el: 1 };
+  static WEAK_YANG_FIRE = { index: 2, display_name: "少阳相火", prefix: "少阳", factor: "火", element: Element.FIRE, el: 1 };
+  static DOMINANT_YIN_EARTH = { index: 3, display_name: "太阴湿土", prefix: "太阴", factor: "湿", element: Element.EARTH, el: 2 };
+  static MILD_YANG_METAL = { index: 4, display_name: "阳明燥金", prefix: "阳明", factor: "燥", element: Element.METAL, el: 3 };
+  static DOMINANT_YANG_WATER = { index: 5, display_name: "太阳寒水", prefix: "太阳", factor: "寒", element: Element.WATER, el: 4 };
+
+  private static readonly ORDER = [QiType.WEAK_YIN_WOOD, QiType.MILD_YIN_FIRE, QiType.WEAK_YANG_FIRE, QiType.DOMINANT_YIN_EARTH, QiType.MILD_YANG_METAL, QiType.DOMINANT_YANG_WATER];
+  // 六气前驱表，下标为 qi.index：前一气 / 前两气
+  private static readonly PREV = QiType.ORDER.map((_, i) => QiType.ORDER[(i + 5) % 6]);
+  private static readonly PREV2 = QiType.ORDER.map((_, i) => QiType.ORDER[(i + 4) % 6]);
 
   static list() {
-    return [this.WEAK_YIN_WOOD, this.MILD_YIN_FIRE, this.WEAK_YANG_FIRE, this.DOMINANT_YIN_EARTH, this.MILD_YANG_METAL, this.DOMINANT_YANG_WATER];
+    return this.ORDER;
   }
 
   static previous(qi: any) {
-    const order = this.list();
-    const idx = order.findIndex(q => q.display_name === qi.display_name);
-    return order[(idx - 1 + 6) % 6];
+    return this.PREV[qi.index];
+  }
+
+  static previous2(qi: any) {
+    return this.PREV2[qi.index];
   }
 }
 
+// 地支 -> [司天, 在泉]，对冲地支同气（子午、丑未…），下标为 EarthlyBranch.index % 6
+// 各条目为共享只读对象，getClimaticEffect 直接返回，无需逐实例分配
+const BRANCH_CLIMATIC_EFFECTS: readonly { readonly celestial: any, readonly terrestrial: any }[] = [
+  { celestial: QiType.MILD_YIN_FIRE, terrestrial: QiType.MILD_YANG_METAL },         // 子午
+  { celestial: QiType.DOMINANT_YIN_EARTH, terrestrial: QiType.DOMINANT_YANG_WATER }, // 丑未
+  { celestial: QiType.WEAK_YANG_FIRE, terrestrial: QiType.WEAK_YIN_WOOD },           // 寅申
+  { celestial: QiType.MILD_YANG_METAL, terrestrial: QiType.MILD_YIN_FIRE },          // 卯酉
+  { celestial: QiType.DOMINANT_YANG_WATER, terrestrial: QiType.DOMINANT_YIN_EARTH }, // 辰戌
+  { celestial: QiType.WEAK_YIN_WOOD, terrestrial: QiType.WEAK_YANG_FIRE },           // 巳亥
+].map(effect => Object.freeze(effect));
+
+// 六步客气（共享只读），与 BRANCH_CLIMATIC_EFFECTS 同下标：司天前二、前一、司天，在泉前二、前一、在泉
+const BRANCH_GUEST_QI_SEQUENCES = BRANCH_CLIMATIC_EFFECTS.map(({ celestial: st, terrestrial: zq }) => Object.freeze([
+  QiType.previous2(st),
+  QiType.previous(st),
+  st,
+  QiType.previous2(zq),
+  QiType.previous(zq),
+  zq
+]));
+
+// 按字段展开的干支/六气属性表（SoA），供批量计分按下标直接读取
+const STEM_EL = Int8Array.from(HeavenlyStem.list(), stem => stem.el);
+const STEM_EXCESS = Uint8Array.from(HeavenlyStem.list(), stem => stem.adequacy === Adequacy.EXCESS ? 1 : 0);
+const QI_EL = Int8Array.from(QiType.list(), qi => qi.el);
+const QI_PREFIX = QiType.list().map(qi => qi.prefix);
+const BRANCH_SITIAN_QI = Int8Array.from(EarthlyBranch.list(), branch => BRANCH_CLIMATIC_EFFECTS[branch.index % 6].celestial.index);
+const BRANCH_ZAIQUAN_QI = Int8Array.from(EarthlyBranch.list(), branch => BRANCH_CLIMATIC_EFFECTS[branch.index % 6].terrestrial.index);
+
 // ==========================================
 // 2. 高精度天文历法引擎 (Astronomical Engine)
 // ==========================================
 
+// 节气估算日期（保底方案），模块级常量避免每次调用重建
+const JIEQI_ESTIMATES: Readonly<Record<string, {m: number, d: number}>> = Object.freeze({
+  "大寒": {m: 1, d: 20}, "春分": {m: 3, d: 20}, "小满": {m: 5, d: 21}, 
+  "芒种": {m: 6, d: 5}, "大暑": {m: 7, d: 23}, "处暑": {m: 8, d: 23}, 
+  "秋分": {m: 9, d: 23}, "小雪": {m: 11, d: 22}, "立冬": {m: 11, d: 7}
+});
+const JIEQI_DEFAULT_ESTIMATE = {m: 6, d: 15};
+
+// 基于 Map 插入顺序的 LRU：命中时移到末尾，超出容量时淘汰最早的键
+const lruGet = <K, V>(cache: Map<K, V>, key: K): V | undefined => {
+  const value = cache.get(key);
+  if (value !== undefined) {
+    cache.delete(key);
+    cache.set(key, value);
+  }
+  return value;
+};
+
+const lruSet = <K, V>(cache: Map<K, V>, key: K, value: V, maxSize: number) => {
+  cache.set(key, value);
+  if (cache.size > maxSize) {
+    cache.delete(cache.keys().next().value!);
+  }
+};
+
+// 年份来自请求参数，缓存必须有上限
+const JIEQI_CACHE_SIZE = 4096;
+const JIEQI_TABLE_CACHE_SIZE = 256;
+
 class AstronomyEngine {
-  static getExactJieqi(year: number, termName: string): Date {
+  // (year, termName) -> 节气时间戳，LRU 缓存
+  static jieqiCache = new Map<string, number>();
+  // (year, termName) -> 预渲染节气时间戳，大小由表文件固定，不参与 LRU 淘汰
+  static prerenderedJieqi: Map<string, number> | undefined = undefined;
+
+  // 载入 npm run build:jieqi 生成的节气表；文件缺失时为空表，全部走 lunar-javascript 推算
+  static getPrerenderedJieqi() {
+    if (this.prerenderedJieqi) return this.prerenderedJieqi;
+    const table = new Map<string, number>();
     try {
-      // 优化：直接从该年的中点获取历法表，通常包含全年的节气
-      const lunar = Solar.fromYmd(year, 6, 15).getLunar();
-      const jieqi = lunar.getJieQiTable();
-      
-      let term = null;
-      if (typeof (jieqi as any).get === 'function') {
-        term = (jieqi as any).get(termName);
+      if (fs.existsSync(JIEQI_TABLE_FILE)) {
+        const { startYear, terms, years } = JSON.parse(fs.readFileSync(JIEQI_TABLE_FILE, "utf-8"));
+        years.forEach((row: (number[] | null)[], i: number) => {
+          row.forEach((t, j) => {
+            if (t) table.set(`${startYear + i}:${terms[j]}`, jieqiRowToDate(t).getTime());
+          });
+        });
       } else {
-        term = (jieqi as any)[termName];
+        console.warn(`Prerendered jieqi table not found at ${JIEQI_TABLE_FILE}; run "npm run build:jieqi".`);
       }
+    } catch (e) {
+      console.error("Failed to load prerendered jieqi table:", e);
+    }
+    this.prerenderedJieqi = table;
+    return table;
+  }
 
-      if (!term || term.getYear() !== year) {
-        const yearsToCheck = [year - 1, year + 1];
-        for (const y of yearsToCheck) {
-          const l = Solar.fromYmd(y, 6, 15).getLunar();
-          const j = l.getJieQiTable();
-          const t = typeof (j as any).get === 'function' ? (j as any).get(termName) : (j as any)[termName];
-          if (t && t.getYear() === year) {
-            term = t;
-            break;
-          }
-        }
-      }
+  static getExactJieqi(year: number, termName: string): Date {
+    const key = `${year}:${termName}`;
+    let ts = this.getPrerenderedJieqi().get(key) ?? lruGet(this.jieqiCache, key);
+    if (ts === undefined) {
+      ts = this.computeExactJieqi(year, termName).getTime();
+      lruSet(this.jieqiCache, key, ts, JIEQI_CACHE_SIZE);
+    }
+    // 调用方会原地修改返回值 (setDate)，因此每次返回新的 Date
+    return new Date(ts);
+  }
 
-      if (term) {
-        return new Date(term.getYear(), term.getMonth() - 1, term.getDay(), term.getHour(), term.getMinute(), term.getSecond());
-      }
-    } catch (e) {
-      console.error(`Error in getExactJieqi for ${termName} in ${year}:`, e);
+  // (year, month) -> 该月 15 日所在农历年的节气表；同一张表可服务全部节气查询。
+  // 表对象较大，LRU 上限远小于 jieqiCache
+  static jieqiTableCache = new Map<string, any>();
+
+  static getJieqiTable(year: number, month: number) {
+    const key = `${year}-${month}`;
+    let table = lruGet(this.jieqiTableCache, key);
+    if (table === undefined) {
+      table = Solar.fromYmd(year, month, 15).getLunar().getJieQiTable();
+      lruSet(this.jieqiTableCache, key, table, JIEQI_TABLE_CACHE_SIZE);
     }
+    return table;
+  }
 
-    // 保底方案 1：遍历该年的月份
-    try {
-      for (let m = 1; m <= 12; m++) {
-        const l = Solar.fromYmd(year, m, 15).getLunar();
-        const j = l.getJieQiTable();
-        const t = typeof (j as any).get === 'function' ? (j as any).get(termName) : (j as any)[termName];
-        if (t && t.getYear() === year) {
-          return new Date(t.getYear(), t.getMonth() - 1, t.getDay(), t.getHour(), t.getMinute(), t.getSecond());
-        }
-      }
-    } catch (e) {}
+  static computeExactJieqi(year: number, termName: string): Date {
+    const term = findJieqiTerm(year, termName, (y, m) => this.getJieqiTable(y, m));
+    if (term) return jieqiRowToDate(jieqiTermToRow(term));
 
-    // 保底方案 2：返回一个估算日期，防止程序崩溃
+    // 保底方案：返回一个估算日期，防止程序崩溃
     console.warn(`Using estimated date for ${termName} in ${year}`);
-    const estimates: Record<string, {m: number, d: number}> = {
-      "大寒": {m: 1, d: 20}, "春分": {m: 3, d: 20}, "小满": {m: 5, d: 21}, 
-      "芒种": {m: 6, d: 5}, "大暑": {m: 7, d: 23}, "处暑": {m: 8, d: 23}, 
-      "秋分": {m: 9, d: 23}, "小雪": {m: 11, d: 22}, "立冬": {m: 11, d: 7}
-    };
-    const est = estimates[termName] || {m: 6, d: 15};
+    const est = JIEQI_ESTIMATES[termName] || JIEQI_DEFAULT_ESTIMATE;
     return new Date(year, est.m - 1, est.d, 12, 0, 0);
   }
 }
@@ -323,11 +404,40 @@ class AstronomyEngine {
 // 3. 五运六气核心逻辑 (WuYunLiuQi Engine)
 // ==========================================
 
+// 十干岁运（共享只读），下标为 HeavenlyStem.index
+const YEAR_FORTUNES = HeavenlyStem.list().map(stem => Object.freeze({
+  element: stem.element,
+  adequacy: stem.adequacy,
+  description: `${stem.element}运${stem.adequacy}`
+}));
+
+// 五运交运：节气 + 偏移天数；六气交气节气。两者末端均为次年大寒
+const FORTUNE_TERM_OFFSETS: readonly (readonly [string, number])[] = [["大寒", 0], ["春分", 13], ["芒种", 10], ["处暑", 7], ["立冬", 4]];
+const QI_TERMS: readonly string[] = ["大寒", "春分", "小满", "大暑", "秋分", "小雪"];
+
+// 在升序边界 bounds 中二分查找 target 所在区间 [bounds[i], bounds[i+1])；
+// 落在首个边界之前或末个边界之后时归入最后一步
+const findStep = (bounds: Date[], target: Date): number => {
+  const t = target.getTime();
+  let lo = 0, hi = bounds.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (bounds[mid].getTime() <= t) lo = mid + 1;
+    else hi = mid;
+  }
+  const step = lo - 1;
+  return step < 0 || step >= bounds.length - 1 ? bounds.length - 2 : step;
+};
+
 class WuYunLiuQi {
   targetDate: Date;
   wuyunYear: number;
   stem: any;
   branch: any;
+  // 惰性缓存字段显式初始化，使所有实例共享同一对象形状（hidden class）
+  private guestFortunes: { step: number, element: Element, el: number, adequacy: Adequacy }[] | undefined = undefined;
+  private fortuneState: { step: number, startDates: Date[] } | undefined = undefined;
+  private qiState: { step: number, bounds: Date[] } | undefined = undefined;
 
   constructor(dateObj: Date) {
     this.targetDate = dateObj;
@@ -348,29 +458,26 @@ class WuYunLiuQi {
       this.wuyunYear = currentYear;
     }
 
-    this.stem = HeavenlyStem.fromYear(this.wuyunYear);
-    this.branch = EarthlyBranch.fromYear(this.wuyunYear);
+    ({ stem: this.stem, branch: this.branch } = sexagenaryFromYear(this.wuyunYear));
   }
 
   getYearFortune() {
-    return {
-      element: this.stem.element,
-      adequacy: this.stem.adequacy,
-      description: `${this.stem.element}运${this.stem.adequacy}`
-    };
+    return YEAR_FORTUNES[this.stem.index];
   }
 
   getGuestFortunes() {
+    if (this.guestFortunes) return this.guestFortunes;
     const fortunes = [];
-    let currentElement = this.stem.element;
+    let currentEl: number = this.stem.el;
     let currentAdequacy = this.stem.adequacy;
     for (let i = 0; i < 5; i++) {
       fortunes.push({
-        step: i + 1, element: currentElement, adequacy: currentAdequacy
+        step: i + 1, element: ELEMENTS[currentEl], el: currentEl, adequacy: currentAdequacy
       });
-      currentElement = ElementGeneration[currentElement];
+      currentEl = ELEMENT_GEN[currentEl];
       currentAdequacy = currentAdequacy === Adequacy.EXCESS ? Adequacy.DEFICIENCY : Adequacy.EXCESS;
     }
+    this.guestFortunes = fortunes;
     return fortunes;
   }
 
@@ -379,85 +486,50 @@ class WuYunLiuQi {
   }
 
   getClimaticEffect() {
-    const mapping: any = [
-      { branches: [EarthlyBranch.ZI.char, EarthlyBranch.WU.char], effects: [QiType.MILD_YIN_FIRE, QiType.MILD_YANG_METAL] },
-      { branches: [EarthlyBranch.CHOU.char, EarthlyBranch.WEI.char], effects: [QiType.DOMINANT_YIN_EARTH, QiType.DOMINANT_YANG_WATER] },
-      { branches: [EarthlyBranch.YIN.char, EarthlyBranch.SHEN.char], effects: [QiType.WEAK_YANG_FIRE, QiType.WEAK_YIN_WOOD] },
-      { branches: [EarthlyBranch.MAO.char, EarthlyBranch.YOU.char], effects: [QiType.MILD_YANG_METAL, QiType.MILD_YIN_FIRE] },
-      { branches: [EarthlyBranch.CHEN.char, EarthlyBranch.XU.char], effects: [QiType.DOMINANT_YANG_WATER, QiType.DOMINANT_YIN_EARTH] },
-      { branches: [EarthlyBranch.SI.char, EarthlyBranch.HAI.char], effects: [QiType.WEAK_YIN_WOOD, QiType.WEAK_YANG_FIRE] },
-    ];
-    for (const item of mapping) {
-      if (item.branches.includes(this.branch.char)) {
-        return { celestial: item.effects[0], terrestrial: item.effects[1] };
-      }
-    }
+    return BRANCH_CLIMATIC_EFFECTS[this.branch.index % 6];
   }
 
   getGuestQiSequence() {
-    const effect = this.getClimaticEffect()!;
-    const st = effect.celestial;
-    const zq = effect.terrestrial;
-    return [
-      QiType.previous(QiType.previous(st)),
-      QiType.previous(st),
-      st,
-      QiType.previous(QiType.previous(zq)),
-      QiType.previous(zq),
-      zq
-    ];
+    return BRANCH_GUEST_QI_SEQUENCES[this.branch.index % 6];
   }
 
-  getCurrentFortuneEnums() {
-    const termOffsets: [string, number][] = [["大寒", 0], ["春分", 13], ["芒种", 10], ["处暑", 7], ["立冬", 4]];
-    const startDates = termOffsets.map(([term, offset]) => {
+  // 当前所处的运（0-4）及各运交运日期，getCurrentFortune / getCurrentFortuneEnums 共用
+  private getFortuneState() {
+    if (this.fortuneState) return this.fortuneState;
+    const startDates = FORTUNE_TERM_OFFSETS.map(([term, offset]) => {
       const d = AstronomyEngine.getExactJieqi(this.wuyunYear, term);
       d.setDate(d.getDate() + offset);
       return d;
     });
     startDates.push(AstronomyEngine.getExactJieqi(this.wuyunYear + 1, "大寒"));
-    
-    let step = 4;
-    for (let i = 0; i < 5; i++) {
-      if (this.targetDate >= startDates[i] && this.targetDate < startDates[i + 1]) {
-        step = i;
-        break;
-      }
-    }
+    const step = findStep(startDates, this.targetDate);
+    this.fortuneState = { step, startDates };
+    return this.fortuneState;
+  }
+
+  // 当前所处的气（0-5）及六气交气日期，getCurrentQi / getCurrentQiEnums 共用
+  private getQiState() {
+    if (this.qiState) return this.qiState;
+    const bounds = QI_TERMS.map(t => AstronomyEngine.getExactJieqi(this.wuyunYear, t));
+    bounds.push(AstronomyEngine.getExactJieqi(this.wuyunYear + 1, "大寒"));
+    const step = findStep(bounds, this.targetDate);
+    this.qiState = { step, bounds };
+    return this.qiState;
+  }
+
+  getCurrentFortuneEnums() {
+    const { step } = this.getFortuneState();
     return [this.getHostFortunes()[step], this.getGuestFortunes()[step].element];
   }
 
   getCurrentQiEnums() {
-    const terms = ["大寒", "春分", "小满", "大暑", "秋分", "小雪", "大寒"];
-    const bounds = terms.map((t, i) => AstronomyEngine.getExactJieqi(this.wuyunYear + (i === 6 ? 1 : 0), t));
-    
-    let step = 5;
-    for (let i = 0; i < 6; i++) {
-      if (this.targetDate >= bounds[i] && this.targetDate < bounds[i + 1]) {
-        step = i;
-        break;
-      }
-    }
+    const { step } = this.getQiState();
     const hostQis = QiType.list();
     return [hostQis[step], this.getGuestQiSequence()[step]];
   }
 
   getCurrentFortune() {
-    const termOffsets: [string, number][] = [["大寒", 0], ["春分", 13], ["芒种", 10], ["处暑", 7], ["立冬", 4]];
-    const startDates = termOffsets.map(([term, offset]) => {
-      const d = AstronomyEngine.getExactJieqi(this.wuyunYear, term);
-      d.setDate(d.getDate() + offset);
-      return d;
-    });
-    startDates.push(AstronomyEngine.getExactJieqi(this.wuyunYear + 1, "大寒"));
-    
-    let step = 4;
-    for (let i = 0; i < 5; i++) {
-      if (this.targetDate >= startDates[i] && this.targetDate < startDates[i + 1]) {
-        step = i;
-        break;
-      }
-    }
+    const { step, startDates } = this.getFortuneState();
     const h = this.getHostFortunes()[step];
     const g = this.getGuestFortunes()[step];
     return {
@@ -469,16 +541,7 @@ class WuYunLiuQi {
   }
 
   getCurrentQi() {
-    const terms = ["大寒", "春分", "小满", "大暑", "秋分", "小雪", "大寒"];
-    const bounds = terms.map((t, i) => AstronomyEngine.getExactJieqi(this.wuyunYear + (i === 6 ? 1 : 0), t));
-    
-    let step = 5;
-    for (let i = 0; i < 6; i++) {
-      if (this.targetDate >= bounds[i] && this.targetDate < bounds[i + 1]) {
-        step = i;
-        break;
-      }
-    }
+    const { step, bounds } = this.getQiState();
     const h = QiType.list()[step];
     const g = this.getGuestQiSequence()[step];
     const formatDate = (d: Date) => `${(d.getMonth() + 1).toString().padStart(2, '0')}-${d.getDate().toString().padStart(2, '0')}`;
@@ -495,14 +558,26 @@ class WuYunLiuQi {
 // 4. AHI K线图生成引擎 (AHI Engine)
 // ==========================================
 
+// 按 ELEMENT_RELATION 关系码取分（同气、a 生 b、b 生 a、a 克 b、b 克 a）
+// 流年岁运 a 对先天岁运 b
+const SUI_YUN_RELATION_PTS = Int8Array.of(10, 7, 7, -10, -10);
+// 流年客运 a 对出生主运 b
+const GUEST_YUN_RELATION_PTS = Int8Array.of(8, 6, 6, -10, -10);
+// 先天岁运 a 对先天司天 b：同气 -5，运生天 -6，天生运 +10，运克天 -8，天克运 -12
+const NATAL_SITIAN_RELATION_PTS = Int8Array.of(-5, -6, 10, -8, -12);
+
+// 年龄漂移值，下标为 age - 1：1-20 岁 +0.6，21-40 岁 0，41-50 岁 -0.8，51-60 岁 -1.2
+const LIFECYCLE_DRIFT = Float64Array.from({ length: 60 }, (_, k) => k < 20 ? 0.6 : (k < 40 ? 0.0 : (k < 50 ? -0.8 : -1.2)));
+
 class AHIEngine {
   birthDt: Date;
   natalCalc: WuYunLiuQi;
-  natalSuiYun: Element;
+  // 以下五行均为 ELEMENTS 下标
+  natalSuiYun: number;
   natalAdequacy: Adequacy;
-  strongZang: Element;
-  weakZang: Element;
-  birthHostYun: Element;
+  strongZang: number;
+  weakZang: number;
+  birthHostYun: number;
   birthHostQi: any;
   birthGuestQi: any;
   baseScore: number;
@@ -511,19 +586,16 @@ class AHIEngine {
     this.birthDt = birthDt;
     this.natalCalc = new WuYunLiuQi(birthDt);
 
-    this.natalSuiYun = this.natalCalc.stem.element;
+    this.natalSuiYun = this.natalCalc.stem.el;
     this.natalAdequacy = this.natalCalc.stem.adequacy;
 
-    if (this.natalAdequacy === Adequacy.EXCESS) {
-      this.strongZang = this.natalSuiYun;
-      this.weakZang = ElementOvercomes[this.natalSuiYun];
-    } else {
-      this.weakZang = this.natalSuiYun;
-      this.strongZang = ElementOvercomer[this.natalSuiYun];
-    }
+    // 两个分支按相同顺序赋值，保持实例形状一致
+    const excess = this.natalAdequacy === Adequacy.EXCESS;
+    this.strongZang = excess ? this.natalSuiYun : ELEMENT_OVCR[this.natalSuiYun];
+    this.weakZang = excess ? ELEMENT_OVC[this.natalSuiYun] : this.natalSuiYun;
 
     const [hostYun, _] = this.natalCalc.getCurrentFortuneEnums();
-    this.birthHostYun = hostYun as Element;
+    this.birthHostYun = ELEMENTS.indexOf(hostYun as Element);
     const [hostQi, guestQi] = this.natalCalc.getCurrentQiEnums();
     this.birthHostQi = hostQi;
     this.birthGuestQi = guestQi;
@@ -533,14 +605,15 @@ class AHIEngine {
 
   _calcBaseScore() {
     let score = 75; // 基础健康分提升至 75
-    const hEl = this.birthHostQi.element;
-    const gEl = this.birthGuestQi.element;
+    const hEl = this.birthHostQi.el;
+    const gEl = this.birthGuestQi.el;
 
-    if (ElementGeneration[gEl] === hEl || ElementGeneration[hEl] === gEl || gEl === hEl) {
+    const rel = ELEMENT_RELATION[hEl * 5 + gEl];
+    if (rel === REL_SAME || rel === REL_A_GEN_B || rel === REL_B_GEN_A) {
       score += 5;
-    } else if (ElementOvercomes[hEl] === gEl) {
+    } else if (rel === REL_A_OVC_B) {
       score -= 8;
-    } else if (ElementOvercomes[gEl] === hEl) {
+    } else {
       score -= 5;
     }
 
@@ -552,76 +625,158 @@ class AHIEngine {
       score -= 5;
     }
 
-    const effect = this.natalCalc.getClimaticEffect()!;
-    const siTian = effect.celestial.element;
+    const effect = this.natalCalc.getClimaticEffect();
+    const siTian = effect.celestial.el;
     const suiYun = this.natalSuiYun;
-    const branchEl = this.natalCalc.branch.element;
+    const branchEl = this.natalCalc.branch.el;
 
-    if (ElementGeneration[siTian] === suiYun) score += 10;
     if (suiYun === branchEl) score += 8;
-    if (ElementGeneration[suiYun] === siTian) score -= 6;
-    if (ElementOvercomes[suiYun] === siTian) score -= 8;
-    if (ElementOvercomes[siTian] === suiYun) score -= 12;
-    if (suiYun === siTian) score -= 5;
+    score += NATAL_SITIAN_RELATION_PTS[ELEMENT_RELATION[suiYun * 5 + siTian]];
 
     return score;
   }
 
-  calculateYearAhi(targetYear: number): number {
-    const dt = AstronomyEngine.getExactJieqi(targetYear, "大寒");
-    const flowYear = new WuYunLiuQi(dt);
-
-    const cySuiYun = flowYear.stem.element;
-    const cyAdequacy = flowYear.stem.adequacy;
-    const effect = flowYear.getClimaticEffect()!;
-    const siTian = effect.celestial;
-    const zaiQuan = effect.terrestrial;
-
-    let suiYunPts = 0;
-    if (cySuiYun === this.natalSuiYun) suiYunPts += 10;
-    else if (ElementGeneration[cySuiYun] === this.natalSuiYun || ElementGeneration[this.natalSuiYun] === cySuiYun) suiYunPts += 7;
-    else if (ElementOvercomes[cySuiYun] === this.natalSuiYun || ElementOvercomes[this.natalSuiYun] === cySuiYun) suiYunPts -= 10;
-
-    if (cyAdequacy === Adequacy.EXCESS && ElementOvercomes[cySuiYun] === this.weakZang) suiYunPts -= 6;
-    if (cyAdequacy === Adequacy.DEFICIENCY && ElementGeneration[cySuiYun] === this.strongZang) suiYunPts += 5;
-
-    const guestYuns = flowYear.getGuestFortunes().map(f => f.element);
-    let stepPtsSum = 0;
-    for (const gy of guestYuns) {
-      let s = 0;
-      if (gy === this.birthHostYun) s += 8;
-      else if (ElementGeneration[gy] === this.birthHostYun || ElementGeneration[this.birthHostYun] === gy) s += 6;
-      else if (ElementOvercomes[gy] === this.birthHostYun || ElementOvercomes[this.birthHostYun] === gy) s -= 10;
-      stepPtsSum += s;
+  // 流年属性表，按六十甲子排列，下标为 (targetYear - 4) mod 60
+  static flowTable?: {
+    suiYun: Int8Array;
+    excess: Uint8Array;
+    siTian: Int8Array;
+    zaiQuan: Int8Array;
+    stPrefix: string[];
+    zqPrefix: string[];
+    guestYun: Int8Array; // 60 x 5，行优先
+  };
+
+  static getFlowTable() {
+    if (this.flowTable) return this.flowTable;
+    const table = {
+      suiYun: new Int8Array(60),
+      excess: new Uint8Array(60),
+      siTian: new Int8Array(60),
+      zaiQuan: new Int8Array(60),
+      stPrefix: new Array<string>(60),
+      zqPrefix: new Array<string>(60),
+      guestYun: new Int8Array(60 * 5),
+    };
+    for (let i = 0; i < 60; i++) {
+      // 以当年大寒为准：太过年提前交运仍属当年，不及年推后交运归属前一年
+      const flow = STEM_EXCESS[i % 10] === 1 ? i : (i + 59) % 60;
+      const stem = flow % 10;
+      const branch = flow % 12;
+      table.suiYun[i] = STEM_EL[stem];
+      table.excess[i] = STEM_EXCESS[stem];
+      table.siTian[i] = QI_EL[BRANCH_SITIAN_QI[branch]];
+      table.zaiQuan[i] = QI_EL[BRANCH_ZAIQUAN_QI[branch]];
+      table.stPrefix[i] = QI_PREFIX[BRANCH_SITIAN_QI[branch]];
+      table.zqPrefix[i] = QI_PREFIX[BRANCH_ZAIQUAN_QI[branch]];
+      // 客运自岁运起，按五行相生依次推移
+      let el = STEM_EL[stem];
+      for (let j = 0; j < 5; j++) {
+        table.guestYun[i * 5 + j] = el;
+        el = ELEMENT_GEN[el];
+      }
+    }
+    this.flowTable = table;
+    return table;
+  }
+
+  // 健康惯性递推：收盘 = (上年*0.6 + 先天基准*0.4) + 流年碰撞 + 年龄漂移，限制在 0-100
+  calculateKline(startYear: number, years: number = 60): { opens: Float64Array, closes: Float64Array } {
+    const impacts = this.calculateImpacts(startYear, years);
+    const opens = new Float64Array(years);
+    const closes = new Float64Array(years);
+    const baseScore = this.baseScore;
+    let currentHealth = baseScore;
+    for (let k = 0; k < years; k++) {
+      opens[k] = currentHealth;
+      const lifecycleDrift = LIFECYCLE_DRIFT[Math.min(k, LIFECYCLE_DRIFT.length - 1)];
+      const dynamicBase = (currentHealth * 0.6) + (baseScore * 0.4);
+      currentHealth = Math.max(0, Math.min(100, dynamicBase + impacts[k] + lifecycleDrift));
+      closes[k] = currentHealth;
+    }
+    return { opens, closes };
+  }
+
+  // 先天特征相同的命盘共享同一张碰撞分表，跨请求复用
+  static impactTableCache = new Map<string, Float64Array>();
+
+  // 自 startYear 起连续 count 年的流年碰撞分
+  calculateImpacts(startYear: number, count: number): Float64Array {
+    const table = this.getImpactTable();
+    const impacts = new Float64Array(count);
+    const start = ((startYear - 4) % 60 + 60) % 60;
+    for (let k = 0; k < count; k++) {
+      impacts[k] = table[(start + k) % 60];
+    }
+    return impacts;
+  }
+
+  getImpactTable(): Float64Array {
+    const key = [this.natalSuiYun, this.strongZang, this.weakZang, this.birthHostYun, this.birthHostQi.prefix, this.birthGuestQi.el].join(",");
+    let table = AHIEngine.impactTableCache.get(key);
+    if (!table) {
+      table = this.computeImpactTable();
+      AHIEngine.impactTableCache.set(key, table);
     }
-    const avgStepPts = stepPtsSum / 5;
-    const weightedYun = (suiYunPts * 0.90) + (avgStepPts * 0.10);
-
-    const bhPrefix = this.birthHostQi.display_name.substring(0, 2);
-    const stPrefix = siTian.display_name.substring(0, 2);
-    const zqPrefix = zaiQuan.display_name.substring(0, 2);
-
-    let sqPts1 = 0;
-    if (stPrefix === bhPrefix || zqPrefix === bhPrefix) sqPts1 += 8;
-    if (ElementGeneration[siTian.element] === this.birthHostQi.element) sqPts1 += 6;
-    if (ElementOvercomes[siTian.element] === this.birthHostQi.element || ElementOvercomes[siTian.element] === this.weakZang) sqPts1 -= 12;
-    if (ElementOvercomes[zaiQuan.element] === this.birthHostQi.element || ElementOvercomes[zaiQuan.element] === this.weakZang) sqPts1 -= 12;
-
-    let sqPts2 = 0;
-    const siTianEl = siTian.element;
-    const guestQiEl = this.birthGuestQi.element;
-
-    if (siTianEl === cySuiYun) {
-      if (siTianEl === this.strongZang) sqPts2 += 8;
-      if (siTianEl === this.weakZang) sqPts2 -= 12;
+    return table;
+  }
+
+  // 单次遍历流年属性表，计算六十甲子每个位置的流年碰撞分
+  computeImpactTable(): Float64Array {
+    const t = AHIEngine.getFlowTable();
+    const natalSuiYun = this.natalSuiYun;
+    const strongZang = this.strongZang;
+    const weakZang = this.weakZang;
+    const birthHostYun = this.birthHostYun;
+    const bhEl: number = this.birthHostQi.el;
+    const guestQiEl: number = this.birthGuestQi.el;
+    const bhPrefix: string = this.birthHostQi.prefix;
+
+    // 与流年无关的逐五行得分，循环外预先算好
+    const guestYunPts = new Int8Array(5);
+    const overcomePts = new Int8Array(5);
+    for (let el = 0; el < 5; el++) {
+      guestYunPts[el] = GUEST_YUN_RELATION_PTS[ELEMENT_RELATION[el * 5 + birthHostYun]];
+      overcomePts[el] = ELEMENT_OVC[el] === bhEl || ELEMENT_OVC[el] === weakZang ? -12 : 0;
     }
 
-    if (ElementOvercomes[siTianEl] === guestQiEl) sqPts2 -= 15;
-    if (ElementGeneration[siTianEl] === guestQiEl) sqPts2 += 10;
-    if (ElementOvercomes[guestQiEl] === siTianEl) sqPts2 -= 8;
+    const impacts = new Float64Array(60);
+    for (let i = 0; i < 60; i++) {
+      const cySuiYun = t.suiYun[i];
+      const siTianEl = t.siTian[i];
+      const zaiQuanEl = t.zaiQuan[i];
+
+      let suiYunPts = SUI_YUN_RELATION_PTS[ELEMENT_RELATION[cySuiYun * 5 + natalSuiYun]];
 
-    const weightedQi = (sqPts1 * 0.40) + (sqPts2 * 0.60);
-    return (weightedYun * 0.30) + (weightedQi * 0.70);
+      if (t.excess[i] === 1 && ELEMENT_OVC[cySuiYun] === weakZang) suiYunPts -= 6;
+      if (t.excess[i] === 0 && ELEMENT_GEN[cySuiYun] === strongZang) suiYunPts += 5;
+
+      let stepPtsSum = 0;
+      for (let j = i * 5; j < i * 5 + 5; j++) {
+        stepPtsSum += guestYunPts[t.guestYun[j]];
+      }
+      const avgStepPts = stepPtsSum / 5;
+      const weightedYun = (suiYunPts * 0.90) + (avgStepPts * 0.10);
+
+      let sqPts1 = 0;
+      if (t.stPrefix[i] === bhPrefix || t.zqPrefix[i] === bhPrefix) sqPts1 += 8;
+      if (ELEMENT_GEN[siTianEl] === bhEl) sqPts1 += 6;
+      sqPts1 += overcomePts[siTianEl] + overcomePts[zaiQuanEl];
+
+      let sqPts2 = 0;
+      if (siTianEl === cySuiYun) {
+        if (siTianEl === strongZang) sqPts2 += 8;
+        if (siTianEl === weakZang) sqPts2 -= 12;
+      }
+
+      if (ELEMENT_OVC[siTianEl] === guestQiEl) sqPts2 -= 15;
+      if (ELEMENT_GEN[siTianEl] === guestQiEl) sqPts2 += 10;
+      if (ELEMENT_OVC[guestQiEl] === siTianEl) sqPts2 -= 8;
+
+      const weightedQi = (sqPts1 * 0.40) + (sqPts2 * 0.60);
+      impacts[i] = (weightedYun * 0.30) + (weightedQi * 0.70);
+    }
+    return impacts;
   }
 }
 
@@ -751,6 +906,146 @@ const ZIWEI_HEALTH_KNOWLEDGE_BASE = `
 此知识库为紫微斗数健康分析的最高标准，所有结论必须严格基于以上映射与机制，不得添加任何未列明的规则。
 `;
 
+// 体质问诊系统提示词：知识库及其余规则在模块加载时拼好，每次只插入年龄段与性别
+const CONSTITUTION_PROMPT_HEAD = `你是一位中医专家，同时是大型医院的中医主治医生，你正在门诊进行坐诊。下面的资料是最新的关于中医体质学说的论文。
+${CONSTITUTION_KNOWLEDGE_BASE}
+首先请你阅读该论文，并对其进行理解吸收。随后请你根据该论文中的内容，经过十轮与用户的问诊，旨在通过这些问诊对所有人群进行体质分类。
+请注意你的问诊应当围绕下方论文中的方向进行，围绕论文中的体质判断方法，准确的判断出该用户的体质。
+
+要求：
+1. 由你发起提问。
+2. 提问必须简洁明了，直击重点，不要有冗长的开场白或过多的感性描述。每轮只提 1-2 个核心问题。
+3. 当你经过十轮提问后，需要确定用户的表述的情况和九种体质各有多少相关度，严格按总分100分，各种体质具体内容计算得出分数，并且严格按照下面按照下面这样的方式给出结论：
+<用户体质：阴虚质80分，平和质10分，气郁质5分，阳虚质5分，痰湿质0分，血瘀质0分，湿热质0分，气虚质0分，特禀质0分>
+4. 接下来第一条消息，你应该向用户问好，你已经得到了ta的年龄段为`;
+const CONSTITUTION_PROMPT_TAIL = `，这次前往门诊是想要进行体质辨识，请根据这些信息开始问诊。
+5. 在问诊结束后，输出包含结论的回话，并且结合论文与用户回答，向用户介绍其得分不为0分的体质，并重点介绍高分体质及其问诊结果中的对应症状。
+6. 严禁输出任何关于“辨证施治”、“食疗建议”、“中药调理”或“寻求医生建议”的免责声明或后续引导文字。
+7. 专注于您的角色，当用户询问与本次问诊无关的话题时，您需要将话题引到问诊本身，并同时拒绝回答无关问题。`;
+
+const buildConstitutionSystemPrompt = (age: string, gender: string) =>
+  `${CONSTITUTION_PROMPT_HEAD}${age}，性别为${gender}${CONSTITUTION_PROMPT_TAIL}`;
+
+const ZIWEI_SYSTEM_INSTRUCTION = `你现在是一位顶级“生命资产风险精算师”，具备深厚的紫微斗数造诣与中医经络精算能力。你擅长将复杂的星盘能量矩阵转化为高度专业、客观、去情感化的【生命资产质量评估报告】。你的分析风格应类比于顶级智库的行业深度研究报告：严谨、精准、直击核心，不带任何主观说教。
+
+你必须严格遵守以下【紫微斗数健康分析核心知识库】进行分析：
+${ZIWEI_HEALTH_KNOWLEDGE_BASE}
+
+报告基本原则：
+1. 严禁提及用户姓名。
+2. **结果导向**：严禁展示任何分析逻辑、推导过程或计算步骤。必须直接输出最终的健康结论。
+3. 严禁使用任何表情符号、器官图标或非文字符号。
+4. 严禁使用医疗敏感词汇，请使用能量术语或中医术语替代。
+5. 采用“高端金融研报”风格，排版需精美、大气。
+6. **严禁使用方括号 [ ] 或类似的标签包裹标题或内容**。
+7. **强制换行规范**：在每一个标题（## 或 ###）之后、以及每一个列表项之间，必须使用双换行符（\n\n），确保输出文本的物理间隔与呼吸感。
+8. **严禁在 Markdown 符号前添加反斜杠（如严禁输出 \## 或 \-）**。
+9. **严禁使用 -> 或 => 等符号**。
+10. **严禁在输出中使用任何反斜杠 \ 进行转义**。直接输出干净的 Markdown 文本。
+
+逻辑增强要求：
+- 你必须执行“先诊断、再建议”的流程。
+- 你必须首先分析用户排盘中能量最低、煞星最密的脏腑经络。
+- 基于此分析，生成针对性的“能量对冲策略”。
+- 严禁给出泛泛而谈的通用建议。
+
+排版与视觉要求：
+- **严禁使用表格**。
+- **严禁将所有内容挤在一个自然段**。
+- **必须使用标准的 Markdown 标题格式**：使用 ## 作为模块大标题，### 作为核心结论小标题。
+- 关键结论必须使用 > 引用块进行强调。
+- 核心术语使用 **加粗**。
+
+报告结构要求：
+
+## 生命资产底盘：先天能量分布与结构性脆弱点
+
+识别煞星+化忌密度最高的前三个地支宫位。直接描述健康风险结果。严禁提及宫位名称或星曜名称。
+
+## 核心资产质量：疾厄宫星曜能量穿透分析
+
+针对【疾厄宫】进行能量穿透分析。直接输出体质根源深度建模结果。
+
+## 风险敞口预警：时空维度的动态压力测试
+
+1. **大限风险**：明确指出当前大限的结构性风险结论。
+
+2. **流年风险**：明确说明“用户今年”的即时性风险。
+
+3. **心理预警（福德宫）**：若流年福德宫存在“化忌”，提示焦虑压力。
+
+## 生命资产优化策略：能量对冲与风险管理建议
+
+给出高度定制化的对冲建议。
+
+数据输出要求：
+你必须返回一个JSON对象，包含以下字段：
+1. report: 完整的Markdown格式报告文本。
+2. riskScores: 一个对象，包含以下精算指标（0-100分）：
+   - structuralVulnerability: 结构性脆弱指数
+   - energyDeficit: 能量赤字水平
+   - temporalPressure: 时空压力峰值
+   - overallRisk: 综合风险评级`;
+
+// 阳宅知识库文件只在首次使用时读取一次
+let spatialSystemInstruction: string | null = null;
+const getSpatialSystemInstruction = () => {
+  if (spatialSystemInstruction === null) {
+    const yangZhaiTheory = fs.readFileSync(path.join(__dirname, "references/阳宅理论.txt"), "utf-8");
+    const roomRules = fs.readFileSync(path.join(__dirname, "references/房间风水规则.txt"), "utf-8");
+    spatialSystemInstruction = `你现在是一位精通“阳宅风水”与“中医经络学”的顶级生命资产风险精算师。你擅长通过居住环境的能量布局，精算其对人体生物节律与经络健康的潜在影响。
+
+你必须严格基于以下知识库进行分析：
+【知识库一：阳宅理论】
+${yangZhaiTheory}
+
+【知识库二：房间风水规则】
+${roomRules}
+
+核心分析逻辑（Health-Only Focus）：
+1. 锁定健康关系：名位相等原则、功能区死穴（厨房西北、厕所中宫等）。
+2. 术语规范：严禁使用迷信词汇。使用“环境应力”、“空间共振”、“方位冲突”、“生物节律响应”等中性科学术语。
+
+报告排版与视觉要求（极其重要）：
+1. **严禁将所有内容挤在一个自然段**。
+2. **严禁使用方括号 [ ] 或类似的标签包裹标题或内容**。
+3. **必须使用标准的 Markdown 标题格式**：
+   - 使用 ## 作为模块大标题。
+   - 使用 ### 作为核心结论小标题。
+4. **重点词汇标记**：必须使用 **加粗**（双星号）标记正文中的核心关键词、风险点或建议。
+5. **强制换行规范**：在每一个标题（## 或 ###）之后、以及每一个列表项之间，必须使用双换行符（\n\n），确保输出文本的物理间隔与呼吸感。
+6. 使用列表（- 或 1.）来列举风险点和建议。
+7. 关键结论使用引用块（>）强调。
+8. **严禁在 Markdown 符号前添加反斜杠（如严禁输出 \## 或 \-）**。
+9. **严禁使用 -> 或 => 等符号**。
+10. **严禁在输出中使用任何反斜杠 \ 进行转义**。直接输出干净的 Markdown 文本。
+11. **严禁在正文中出现散乱的 # 符号**。
+
+报告结构要求：
+## 空间能量分布评估
+
+简要描述当前布局的整体能量平衡状态。
+
+## 核心健康风险敞口
+
+直接指出最严重的方位冲突及其对特定成员或系统的健康影响。
+
+## 生物节律优化建议
+
+提供具体的房间调整或布局优化方案。
+
+数据输出要求：
+你必须返回一个JSON对象，包含以下字段：
+1. report: 完整的Markdown格式报告文本。
+2. riskScores: 一个对象，包含以下精算指标（0-100分）：
+   - environmentalStress: 环境应力指数
+   - spatialResonance: 空间共振水平
+   - biologicalResponse: 生物节律响应
+   - overallRisk: 综合风险评级`;
+  }
+  return spatialSystemInstruction;
+};
+
 // ==========================================
 // API Routes
 // ==========================================
@@ -1074,6 +1369,41 @@ app.get("/api/history", isAuthenticated, async (req, res) => {
   }
 });
 
+// 排盘结果只取决于出生日期，按 (年, 月, 日) 做 LRU 缓存；缓存对象共享，调用方不得修改
+const CALCULATION_CACHE_SIZE = 8192;
+const calculationCache = new Map<string, { wylq_summary: any, kline_data: any[], base_score: number }>();
+
+const computeCalculation = (y: number, m: number, d: number) => {
+  const key = `${y}-${m}-${d}`;
+  const cached = lruGet(calculationCache, key);
+  if (cached) return cached;
+
+  const birthDate = new Date(y, m - 1, d, 12, 0);
+  const engine = new AHIEngine(birthDate);
+  const calc = engine.natalCalc;
+  const yf = calc.getYearFortune();
+  const ce = calc.getClimaticEffect();
+  const fortune = calc.getCurrentFortune();
+  const qi = calc.getCurrentQi();
+  const wylq_summary = {
+    ganzhi: `${calc.stem.char}${calc.branch.char}年`,
+    suiyun: `${yf.description} (${yf.element})`,
+    sitian: ce.celestial.display_name,
+    zaiquan: ce.terrestrial.display_name,
+    daily_fortune: `第 ${fortune.step_index} 运 | 主: ${fortune.host} | 客: ${fortune.guest}`,
+    daily_qi: `第 ${qi.step_index} 气 | 主: ${qi.host} | 客: ${qi.guest}`
+  };
+  const kline_data = [];
+  const { opens, closes } = engine.calculateKline(y);
+  for (let age = 1; age <= 60; age++) {
+    kline_data.push({ age, open: parseFloat(opens[age - 1].toFixed(2)), close: parseFloat(closes[age - 1].toFixed(2)) });
+  }
+
+  const result = { wylq_summary, kline_data, base_score: engine.baseScore };
+  lruSet(calculationCache, key, result, CALCULATION_CACHE_SIZE);
+  return result;
+};
+
 app.post("/api/calculate", async (req, res) => {
   try {
     const { year, month, day } = req.body;
@@ -1087,33 +1417,7 @@ app.post("/api/calculate", async (req, res) => {
     
     if (isNaN(y) || isNaN(m) || isNaN(d)) return res.status(400).json({ error: "日期格式不正确" });
 
-    const birthDate = new Date(y, m - 1, d, 12, 0);
-    const calc = new WuYunLiuQi(birthDate);
-    const engine = new AHIEngine(birthDate);
-    const yf = calc.getYearFortune();
-    const ce = calc.getClimaticEffect();
-    if (!ce) return res.status(500).json({ error: "无法计算气候效应" });
-    const fortune = calc.getCurrentFortune();
-    const qi = calc.getCurrentQi();
-    const wylq_summary = {
-      ganzhi: `${calc.stem.char}${calc.branch.char}年`,
-      suiyun: `${yf.description} (${yf.element})`,
-      sitian: ce.celestial.display_name,
-      zaiquan: ce.terrestrial.display_name,
-      daily_fortune: `第 ${fortune.step_index} 运 | 主: ${fortune.host} | 客: ${fortune.guest}`,
-      daily_qi: `第 ${qi.step_index} 气 | 主: ${qi.host} | 客: ${qi.guest}`
-    };
-    const kline_data = [];
-    let currentHealth = engine.baseScore;
-    for (let age = 1; age <= 60; age++) {
-      const calcYear = year + age - 1;
-      const impact = engine.calculateYearAhi(calcYear);
-      let lifecycleDrift = age <= 20 ? 0.6 : (age <= 40 ? 0.0 : (age <= 50 ? -0.8 : -1.2));
-      const dynamicBase = (currentHealth * 0.6) + (engine.baseScore * 0.4);
-      let closeScore = Math.max(0, Math.min(100, dynamicBase + impact + lifecycleDrift));
-      kline_data.push({ age, open: parseFloat(currentHealth.toFixed(2)), close: parseFloat(closeScore.toFixed(2)) });
-      currentHealth = closeScore;
-    }
+    const { wylq_summary, kline_data, base_score } = computeCalculation(y, m, d);
     let historyId = null;
     if (req.session.userId) {
       const birthDateStr = `${y}-${m}-${d}`;
@@ -1123,7 +1427,7 @@ app.post("/api/calculate", async (req, res) => {
           user_id: req.session.userId,
           birth_date: birthDateStr,
           wylq_data: { wylq_summary, kline_data },
-          base_score: engine.baseScore
+          base_score
         })
         .select()
         .single();
@@ -1134,7 +1438,7 @@ app.post("/api/calculate", async (req, res) => {
         historyId = historyData.id;
       }
     }
-    res.json({ wylq_summary, kline_data, base_score: engine.baseScore, historyId });
+    res.json({ wylq_summary, kline_data, base_score, historyId });
   } catch (error: any) {
     console.error("Calculation error:", error);
     res.status(500).json({ error: error.message });
@@ -1144,20 +1448,7 @@ app.post("/api/calculate", async (req, res) => {
 app.post("/api/insight/start", (req, res) => {
   const { age, gender } = req.body;
   if (!age || !gender) return res.status(400).json({ error: "请提供年龄段和性别" });
-  const systemPrompt = `你是一位中医专家，同时是大型医院的中医主治医生，你正在门诊进行坐诊。下面的资料是最新的关于中医体质学说的论文。
-${CONSTITUTION_KNOWLEDGE_BASE}
-首先请你阅读该论文，并对其进行理解吸收。随后请你根据该论文中的内容，经过十轮与用户的问诊，旨在通过这些问诊对所有人群进行体质分类。
-请注意你的问诊应当围绕下方论文中的方向进行，围绕论文中的体质判断方法，准确的判断出该用户的体质。
-
-要求：
-1. 由你发起提问。
-2. 提问必须简洁明了，直击重点，不要有冗长的开场白或过多的感性描述。每轮只提 1-2 个核心问题。
-3. 当你经过十轮提问后，需要确定用户的表述的情况和九种体质各有多少相关度，严格按总分100分，各种体质具体内容计算得出分数，并且严格按照下面按照下面这样的方式给出结论：
-<用户体质：阴虚质80分，平和质10分，气郁质5分，阳虚质5分，痰湿质0分，血瘀质0分，湿热质0分，气虚质0分，特禀质0分>
-4. 接下来第一条消息，你应该向用户问好，你已经得到了ta的年龄段为${age}，性别为${gender}，这次前往门诊是想要进行体质辨识，请根据这些信息开始问诊。
-5. 在问诊结束后，输出包含结论的回话，并且结合论文与用户回答，向用户介绍其得分不为0分的体质，并重点介绍高分体质及其问诊结果中的对应症状。
-6. 严禁输出任何关于“辨证施治”、“食疗建议”、“中药调理”或“寻求医生建议”的免责声明或后续引导文字。
-7. 专注于您的角色，当用户询问与本次问诊无关的话题时，您需要将话题引到问诊本身，并同时拒绝回答无关问题。`;
+  const systemPrompt = buildConstitutionSystemPrompt(age, gender);
   req.session.insightMessages = [{ role: "system", content: systemPrompt }];
   req.session.save((err) => {
     if (err) return res.status(500).json({ error: "会话保存失败" });
@@ -1174,20 +1465,7 @@ app.post("/api/insight/chat", async (req, res) => {
     let messages = [];
     if ((history && Array.isArray(history)) || (age && gender)) {
       const safeHistory = Array.isArray(history) ? history : [];
-      const systemPrompt = `你是一位中医专家，同时是大型医院的中医主治医生，你正在门诊进行坐诊。下面的资料是最新的关于中医体质学说的论文。
-${CONSTITUTION_KNOWLEDGE_BASE}
-首先请你阅读该论文，并对其进行理解吸收。随后请你根据该论文中的内容，经过十轮与用户的问诊，旨在通过这些问诊对所有人群进行体质分类。
-请注意你的问诊应当围绕下方论文中的方向进行，围绕论文中的体质判断方法，准确的判断出该用户的体质。
-
-要求：
-1. 由你发起提问。
-2. 提问必须简洁明了，直击重点，不要有冗长的开场白或过多的感性描述。每轮只提 1-2 个核心问题。
-3. 当你经过十轮提问后，需要确定用户的表述的情况和九种体质各有多少相关度，严格按总分100分，各种体质具体内容计算得出分数，并且严格按照下面按照下面这样的方式给出结论：
-<用户体质：阴虚质80分，平和质10分，气郁质5分，阳虚质5分，痰湿质0分，血瘀质0分，湿热质0分，气虚质0分，特禀质0分>
-4. 接下来第一条消息，你应该向用户问好，你已经得到了ta的年龄段为${age || '未知'}，性别为${gender || '未知'}，这次前往门诊是想要进行体质辨识，请根据这些信息开始问诊。
-5. 在问诊结束后，输出包含结论的回话，并且结合论文与用户回答，向用户介绍其得分不为0分的体质，并重点介绍高分体质及其问诊结果中的对应症状。
-6. 严禁输出任何关于“辨证施治”、“食疗建议”、“中药调理”或“寻求医生建议”的免责声明或后续引导文字。
-7. 专注于您的角色，当用户询问与本次问诊无关的话题时，您需要将话题引到问诊本身，并同时拒绝回答无关问题。`;
+      const systemPrompt = buildConstitutionSystemPrompt(age || '未知', gender || '未知');
       messages = [{ role: "system", content: systemPrompt }, ...safeHistory.map((m: any) => ({ role: m.role === "user" ? "user" : "assistant", content: m.content })), { role: "user", content: message }];
     } else if (req.session.insightMessages) {
       req.session.insightMessages.push({ role: "user", content: message });
@@ -1231,6 +1509,110 @@ K线：${klineText}
 3. 严禁推荐具体方药。
 4. 严禁提及 AI 名称。
 5. 保持专业、深邃的语气。`;
+
+    // 报告先返回给用户，入库在后台完成，不占用响应时间；
+    // 此时响应已发出，入库失败只记日志，不能再进入下方的错误响应
+    const userId = req.session.userId;
+    const saveWuyunReport = (report: string) => {
+      try {
+        getSupabaseAdmin().from('health_reports').insert({
+          user_id: userId,
+          report_type: 'wuyun',
+          content: { report, wylq_summary, kline_data }
+        }).then(({ error }: any) => {
+          if (error) console.error("Failed to save report to Supabase:", error);
+        }, (err: any) => {
+          console.error("Failed to save report to Supabase:", err);
+        });
+      } catch (err) {
+        console.error("Failed to save report to Supabase:", err);
+      }
+    };
+
+    if (req.body.stream) {
+      // 流式输出：大模型边生成边以 SSE 推送给前端，生成结束后再入库
+      const upstream = await axios.post("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation", {
+        model: "qwen-turbo",
+        input: { prompt: prompt },
+        parameters: { result_format: "message", incremental_output: true }
+      }, {
+        headers: { "Authorization": `Bearer ${apiKey}`, "Content-Type": "application/json", "X-DashScope-SSE": "enable" },
+        responseType: "stream"
+      });
+
+      res.setHeader("Content-Type", "text/event-stream");
+      res.setHeader("Cache-Control", "no-cache");
+      res.setHeader("Connection", "keep-alive");
+      res.flushHeaders();
+
+      let report = "";
+      let buffer = "";
+      let upstreamEvent = "";
+      let failed = false;
+      const failStream = (message: string) => {
+        failed = true;
+        res.write(`event: error\ndata: ${JSON.stringify({ error: message })}\n\n`);
+        res.end();
+      };
+      const forwardLine = (line: string) => {
+        if (failed) return;
+        // SSE 帧以空行结束；event: 行只对本帧的 data: 生效
+        if (line === "" || line === "\r") {
+          upstreamEvent = "";
+          return;
+        }
+        if (line.startsWith("event:")) {
+          upstreamEvent = line.slice(6).trim();
+          return;
+        }
+        if (!line.startsWith("data:")) return;
+        if (upstreamEvent === "error") {
+          // 生成中途失败：不把半截内容当作完整报告入库
+          console.error("DashScope stream error:", line.slice(5));
+          failStream("AI 响应中断");
+          upstream.data.destroy();
+          return;
+        }
+        try {
+          const delta = JSON.parse(line.slice(5)).output?.choices?.[0]?.message?.content;
+          if (delta) {
+            report += delta;
+            res.write(`data: ${JSON.stringify({ delta })}\n\n`);
+          }
+        } catch (e) {}
+      };
+      upstream.data.setEncoding("utf8");
+      upstream.data.on("data", (chunk: string) => {
+        buffer += chunk;
+        const lines = buffer.split("\n");
+        buffer = lines.pop() || "";
+        lines.forEach(forwardLine);
+      });
+      upstream.data.on("end", () => {
+        forwardLine(buffer);
+        if (failed) return;
+        if (report) {
+          res.write("event: done\ndata: {}\n\n");
+          res.end();
+          saveWuyunReport(report);
+        } else {
+          failStream("AI 响应异常");
+        }
+      });
+      upstream.data.on("error", (err: any) => {
+        console.error("Report stream error:", err);
+        if (!failed) failStream("AI 响应中断");
+      });
+      // 浏览器断开时中止上游生成；未完整生成的报告不入库
+      res.on("close", () => {
+        if (!res.writableEnded) {
+          failed = true;
+          upstream.data.destroy();
+        }
+      });
+      return;
+    }
+
     const response = await axios.post("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation", {
       model: "qwen-turbo",
       input: { prompt: prompt },
@@ -1239,17 +1621,16 @@ K线：${klineText}
     
     if (response.data?.output?.choices) {
       const report = response.data.output.choices[0].message.content;
-      
-      // Save to Supabase
-      await getSupabaseAdmin().from('health_reports').insert({
-        user_id: req.session.userId,
-        report_type: 'wuyun',
-        content: { report, wylq_summary, kline_data }
-      });
-
       res.json({ report });
+      saveWuyunReport(report);
     } else res.status(500).json({ error: "AI 响应异常" });
   } catch (error: any) {
+    // SSE 头或报告已发出后再出错，只能记录日志并结束响应
+    if (res.headersSent) {
+      console.error("Report generation error after response started:", error);
+      if (!res.writableEnded) res.end();
+      return;
+    }
     if (error.status === 402) return res.status(402).json({ error: "草药余额不足，请充值" });
     res.status(500).json({ error: error.message });
   }
@@ -1264,59 +1645,7 @@ app.post("/api/generate-spatial-report", isAuthenticated, async (req, res) => {
     const apiKey = process.env.DASHSCOPE_API_KEY || process.env.API_KEY;
     if (!apiKey) return res.status(500).json({ error: "服务器未配置 API Key" });
 
-    // Read knowledge bases
-    const yangZhaiTheory = fs.readFileSync(path.join(__dirname, "references/阳宅理论.txt"), "utf-8");
-    const roomRules = fs.readFileSync(path.join(__dirname, "references/房间风水规则.txt"), "utf-8");
-
-    const systemInstruction = `你现在是一位精通“阳宅风水”与“中医经络学”的顶级生命资产风险精算师。你擅长通过居住环境的能量布局，精算其对人体生物节律与经络健康的潜在影响。
-
-你必须严格基于以下知识库进行分析：
-【知识库一：阳宅理论】
-${yangZhaiTheory}
-
-【知识库二：房间风水规则】
-${roomRules}
-
-核心分析逻辑（Health-Only Focus）：
-1. 锁定健康关系：名位相等原则、功能区死穴（厨房西北、厕所中宫等）。
-2. 术语规范：严禁使用迷信词汇。使用“环境应力”、“空间共振”、“方位冲突”、“生物节律响应”等中性科学术语。
-
-报告排版与视觉要求（极其重要）：
-1. **严禁将所有内容挤在一个自然段**。
-2. **严禁使用方括号 [ ] 或类似的标签包裹标题或内容**。
-3. **必须使用标准的 Markdown 标题格式**：
-   - 使用 ## 作为模块大标题。
-   - 使用 ### 作为核心结论小标题。
-4. **重点词汇标记**：必须使用 **加粗**（双星号）标记正文中的核心关键词、风险点或建议。
-5. **强制换行规范**：在每一个标题（## 或 ###）之后、以及每一个列表项之间，必须使用双换行符（\n\n），确保输出文本的物理间隔与呼吸感。
-6. 使用列表（- 或 1.）来列举风险点和建议。
-7. 关键结论使用引用块（>）强调。
-8. **严禁在 Markdown 符号前添加反斜杠（如严禁输出 \## 或 \-）**。
-9. **严禁使用 -> 或 => 等符号**。
-10. **严禁在输出中使用任何反斜杠 \ 进行转义**。直接输出干净的 Markdown 文本。
-11. **严禁在正文中出现散乱的 # 符号**。
-
-报告结构要求：
-## 空间能量分布评估
-
-简要描述当前布局的整体能量平衡状态。
-
-## 核心健康风险敞口
-
-直接指出最严重的方位冲突及其对特定成员或系统的健康影响。
-
-## 生物节律优化建议
-
-提供具体的房间调整或布局优化方案。
-
-数据输出要求：
-你必须返回一个JSON对象，包含以下字段：
-1. report: 完整的Markdown格式报告文本。
-2. riskScores: 一个对象，包含以下精算指标（0-100分）：
-   - environmentalStress: 环境应力指数
-   - spatialResonance: 空间共振水平
-   - biologicalResponse: 生物节律响应
-   - overallRisk: 综合风险评级`;
+    const systemInstruction = getSpatialSystemInstruction();
 
     const response = await axios.post("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation", {
       model: "qwen-max",
@@ -1378,72 +1707,12 @@ app.post("/api/generate-health-report", isAuthenticated, async (req, res) => {
     const apiKey = process.env.DASHSCOPE_API_KEY || process.env.API_KEY;
     if (!apiKey) return res.status(500).json({ error: "服务器未配置 API Key" });
 
-    const systemInstruction = `你现在是一位顶级“生命资产风险精算师”，具备深厚的紫微斗数造诣与中医经络精算能力。你擅长将复杂的星盘能量矩阵转化为高度专业、客观、去情感化的【生命资产质量评估报告】。你的分析风格应类比于顶级智库的行业深度研究报告：严谨、精准、直击核心，不带任何主观说教。
-
-你必须严格遵守以下【紫微斗数健康分析核心知识库】进行分析：
-${ZIWEI_HEALTH_KNOWLEDGE_BASE}
-
-报告基本原则：
-1. 严禁提及用户姓名。
-2. **结果导向**：严禁展示任何分析逻辑、推导过程或计算步骤。必须直接输出最终的健康结论。
-3. 严禁使用任何表情符号、器官图标或非文字符号。
-4. 严禁使用医疗敏感词汇，请使用能量术语或中医术语替代。
-5. 采用“高端金融研报”风格，排版需精美、大气。
-6. **严禁使用方括号 [ ] 或类似的标签包裹标题或内容**。
-7. **强制换行规范**：在每一个标题（## 或 ###）之后、以及每一个列表项之间，必须使用双换行符（\n\n），确保输出文本的物理间隔与呼吸感。
-8. **严禁在 Markdown 符号前添加反斜杠（如严禁输出 \## 或 \-）**。
-9. **严禁使用 -> 或 => 等符号**。
-10. **严禁在输出中使用任何反斜杠 \ 进行转义**。直接输出干净的 Markdown 文本。
-
-逻辑增强要求：
-- 你必须执行“先诊断、再建议”的流程。
-- 你必须首先分析用户排盘中能量最低、煞星最密的脏腑经络。
-- 基于此分析，生成针对性的“能量对冲策略”。
-- 严禁给出泛泛而谈的通用建议。
-
-排版与视觉要求：
-- **严禁使用表格**。
-- **严禁将所有内容挤在一个自然段**。
-- **必须使用标准的 Markdown 标题格式**：使用 ## 作为模块大标题，### 作为核心结论小标题。
-- 关键结论必须使用 > 引用块进行强调。
-- 核心术语使用 **加粗**。
-
-报告结构要求：
-
-## 生命资产底盘：先天能量分布与结构性脆弱点
-
-识别煞星+化忌密度最高的前三个地支宫位。直接描述健康风险结果。严禁提及宫位名称或星曜名称。
-
-## 核心资产质量：疾厄宫星曜能量穿透分析
-
-针对【疾厄宫】进行能量穿透分析。直接输出体质根源深度建模结果。
-
-## 风险敞口预警：时空维度的动态压力测试
-
-1. **大限风险**：明确指出当前大限的结构性风险结论。
-
-2. **流年风险**：明确说明“用户今年”的即时性风险。
-
-3. **心理预警（福德宫）**：若流年福德宫存在“化忌”，提示焦虑压力。
-
-## 生命资产优化策略：能量对冲与风险管理建议
-
-给出高度定制化的对冲建议。
-
-数据输出要求：
-你必须返回一个JSON对象，包含以下字段：
-1. report: 完整的Markdown格式报告文本。
-2. riskScores: 一个对象，包含以下精算指标（0-100分）：
-   - structuralVulnerability: 结构性脆弱指数
-   - energyDeficit: 能量赤字水平
-   - temporalPressure: 时空压力峰值
-   - overallRisk: 综合风险评级`;
 
     const response = await axios.post("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation", {
       model: "qwen-max",
       input: { 
         messages: [
-          { role: "system", content: systemInstruction },
+          { role: "system", content: ZIWEI_SYSTEM_INSTRUCTION },
           { role: "user", content: `请根据以下紫微斗数排盘数据生成JSON格式的健康报告：\n${JSON.stringify(astrolabeData)}` }
         ] 
       },
@@ -1494,6 +1763,8 @@ ${ZIWEI_HEALTH_KNOWLEDGE_BASE}
   // Vite middleware for development
   let vite: any;
   if (process.env.NODE_ENV !== "production") {
+    // 仅开发环境需要 Vite，按需加载以缩短生产环境冷启动
+    const { createServer: createViteServer } = await import("vite");
     vite = await createViteServer({ server: { middlewareMode: true }, appType: "spa" });
     app.use(vite.middlewares);
   } else {
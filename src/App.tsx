@@ -71,10 +71,6 @@ interface CalcResponse {
   historyId?: number | null;
 }
 
-interface ReportResponse {
-  report: string;
-}
-
 interface UserInfo {
   loggedIn: boolean;
   user?: {
@@ -1229,25 +1225,69 @@ export default function App() {
     setIsGeneratingReport(true);
 
     try {
-      const response = await axios.post<ReportResponse>('/api/generate-report', {
-        wylq_summary: calcData.wylq_summary,
-        kline_data: calcData.kline_data,
-        historyId: currentHistoryId
+      // 流式接收报告：每收到一段增量就刷新展示
+      const response = await fetch('/api/generate-report', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          wylq_summary: calcData.wylq_summary,
+          kline_data: calcData.kline_data,
+          historyId: currentHistoryId,
+          stream: true
+        })
       });
-      setReport(formatAIReport(response.data.report));
-      setHasGeneratedReport(true);
-      checkUser(); // Refresh balance
-      
-      setTimeout(() => {
-        document.getElementById('report-section')?.scrollIntoView({ behavior: 'smooth', block: 'start' });
-      }, 100);
-    } catch (error: any) {
-      if (error.response?.status === 402) {
+      if (response.status === 402) {
         setIsRechargeModalOpen(true);
-      } else {
-        console.error("Report generation error:", error);
-        alert("报告生成失败，请稍后重试。");
+        return;
       }
+      if (!response.ok || !response.body) {
+        throw new Error(`Report request failed: ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let text = '';
+      // 只有收到服务端的 done 事件才算完整报告；连接中途断开时正文会被截断
+      let completed = false;
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const evt of events) {
+          const dataLine = evt.split('\n').find(line => line.startsWith('data:'));
+          if (!dataLine) continue;
+          const payload = JSON.parse(dataLine.slice(5));
+          if (evt.startsWith('event: error')) throw new Error(payload.error);
+          if (evt.startsWith('event: done')) {
+            completed = true;
+            continue;
+          }
+          if (payload.delta) {
+            const isFirstDelta = !text;
+            text += payload.delta;
+            setReport(formatAIReport(text));
+            setHasGeneratedReport(true);
+            // 首段内容到达即滚动到报告区，后续内容在原位继续展开
+            if (isFirstDelta) {
+              setTimeout(() => {
+                document.getElementById('report-section')?.scrollIntoView({ behavior: 'smooth', block: 'start' });
+              }, 100);
+            }
+          }
+        }
+      }
+      if (!text) throw new Error("Empty report");
+      if (!completed) throw new Error("Report stream ended before completion");
+      checkUser(); // Refresh balance
+    } catch (error: any) {
+      // 丢弃已展示的半截报告
+      setReport(null);
+      setHasGeneratedReport(false);
+      console.error("Report generation error:", error);
+      alert("报告生成失败，请稍后重试。");
     } finally {
       setIsGeneratingReport(false);
     }